@@ -0,0 +1,23 @@
+"""
+ASGI config for foodgram_project project.
+
+Django 2.2 has no native ASGI support, so the WSGI application runs in
+a thread pool behind ``WSGIBridge``. Cached tag and ingredient lists are
+served straight from the event loop.
+"""
+
+import os
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_project.settings')
+
+django_application = get_wsgi_application()
+
+from recipes.asgi import ReferenceListApplication  # noqa: E402
+
+from .bridge import WSGIBridge  # noqa: E402
+
+application = ReferenceListApplication(
+    WSGIBridge(django_application, settings.ASGI_THREADS))
@@ -0,0 +1,120 @@
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from django.db import close_old_connections
+
+BODY_MEMORY_LIMIT = 1024 * 1024
+SPECIAL_HEADERS = {'content-length': 'CONTENT_LENGTH',
+                   'content-type': 'CONTENT_TYPE'}
+
+
+def build_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode().decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope['headers']:
+        name = name.decode('latin1')
+        key = SPECIAL_HEADERS.get(
+            name, 'HTTP_' + name.upper().replace('-', '_'))
+        value = value.decode('latin1')
+        if key in environ:
+            separator = '; ' if key == 'HTTP_COOKIE' else ','
+            value = environ[key] + separator + value
+        environ[key] = value
+    return environ
+
+
+class WSGIBridge:
+    """ASGI-приложение, запускающее WSGI-приложение Django в пуле потоков.
+
+    Тело запроса читается в цикле событий. Ответ читается из итератора
+    WSGI по одной части в потоке пула, и каждая часть сразу отправляется
+    клиенту. Поток не ждёт медленного клиента, а потоковый ответ
+    (например, список покупок) не собирается в памяти целиком.
+    """
+
+    def __init__(self, application, threads):
+        self.application = application
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='django')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемый тип соединения: '
+                             f'{scope["type"]}')
+        loop = asyncio.get_running_loop()
+        with SpooledTemporaryFile(max_size=BODY_MEMORY_LIMIT) as body:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+            status, headers, result = await loop.run_in_executor(
+                self.executor, self.run, build_environ(scope, body))
+        try:
+            await send({'type': 'http.response.start', 'status': status,
+                        'headers': headers})
+            chunks = iter(result)
+            while True:
+                chunk = await loop.run_in_executor(
+                    self.executor, next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body',
+                                'body': chunk, 'more_body': True})
+        finally:
+            # close() отправляет request_finished.
+            if hasattr(result, 'close'):
+                await loop.run_in_executor(self.executor, result.close)
+        await send({'type': 'http.response.body', 'body': b''})
+
+    def run(self, environ):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin1'), value.encode('latin1'))
+                for name, value in headers]
+
+        result = self.application(environ, start_response)
+        # Части ответа и close() могут выполниться в других потоках пула,
+        # поэтому соединение с базой этого потока закрывается здесь
+        # по тем же правилам, что и после обычного запроса.
+        close_old_connections()
+        return response['status'], response['headers'], result
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
@@ -0,0 +1,54 @@
+import threading
+from collections import defaultdict
+
+from django.http import HttpResponse
+
+METRICS = (
+    ('requests_total', 'counter', 'Количество запросов.'),
+    ('db_queries_total', 'counter', 'Количество SQL-запросов.'),
+    ('db_seconds_total', 'counter', 'Время выполнения SQL-запросов.'),
+    ('serialize_seconds_total', 'counter',
+     'Время сериализации ответа без SQL-запросов.'),
+    ('render_seconds_total', 'counter', 'Время рендеринга ответа.'),
+    ('request_seconds_total', 'counter', 'Полное время обработки запроса.'),
+    ('response_bytes_total', 'counter', 'Размер тел ответов.'),
+    ('query_budget_exceeded_total', 'counter',
+     'Запросы, превысившие бюджет SQL-запросов.'),
+)
+
+
+class MetricsRegistry:
+    """Счётчики по (view, action) в памяти процесса."""
+    prefix = 'foodgram_'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(lambda: [0] * len(METRICS))
+
+    def observe(self, view, action, *values):
+        with self.lock:
+            totals = self.values[(view, action)]
+            for i, value in enumerate(values):
+                totals[i] += value
+
+    def render(self):
+        with self.lock:
+            values = {key: list(totals)
+                      for key, totals in self.values.items()}
+        lines = []
+        for i, (name, metric_type, help_text) in enumerate(METRICS):
+            name = self.prefix + name
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for (view, action), totals in sorted(values.items()):
+                lines.append(f'{name}{{view="{view}",action="{action}"}} '
+                             f'{totals[i]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
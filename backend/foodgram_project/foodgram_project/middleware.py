@@ -0,0 +1,164 @@
+import logging
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection, connections
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0
+        self.serialize_time = 0
+        self.render_time = 0
+        self.view = None
+        self.action = None
+        self.budget = settings.QUERY_BUDGET
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+class SerializationTimingMixin:
+    """Засекает время сериализации ответа для RequestMetricsMiddleware.
+
+    Время SQL-запросов, выполненных во время сериализации, учитывается
+    только в db.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        stats = getattr(self.request, 'request_stats', None)
+        if stats is None:
+            return serializer
+        to_representation = serializer.to_representation
+
+        def timed(instance):
+            started = time.perf_counter()
+            db_time = stats.db_time
+            try:
+                return to_representation(instance)
+            finally:
+                stats.serialize_time += (time.perf_counter() - started
+                                         - (stats.db_time - db_time))
+
+        serializer.to_representation = timed
+        return serializer
+
+
+class RequestMetricsMiddleware:
+    """Считает SQL-запросы, время БД, сериализации и рендеринга для view.
+
+    Результат пишется в заголовок Server-Timing и в счётчики,
+    доступные по адресу /metrics/. Бюджет SQL-запросов — QUERY_BUDGET
+    или значение из атрибута query_budgets класса view для его action.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = request.request_stats = RequestStats()
+        started = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        if stats.view is None:
+            return response
+        size = 0 if response.streaming else len(response.content)
+        over_budget = stats.queries > stats.budget
+        registry.observe(stats.view, stats.action, 1, stats.queries,
+                         stats.db_time, stats.serialize_time,
+                         stats.render_time, total, size, int(over_budget))
+        if over_budget:
+            logger.warning(
+                '%s.%s: %d SQL-запросов при бюджете %d (%s)',
+                stats.view, stats.action, stats.queries,
+                stats.budget, request.path)
+        app_time = (total - stats.db_time - stats.serialize_time
+                    - stats.render_time)
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={stats.db_time * 1000:.1f};'
+            f'desc="{stats.queries} queries"',
+            f'app;dur={app_time * 1000:.1f}',
+            f'serialize;dur={stats.serialize_time * 1000:.1f}',
+            f'render;dur={stats.render_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = request.request_stats
+        view_class = getattr(view_func, 'cls', None)
+        stats.view = (view_class or view_func).__name__
+        method = request.method.lower()
+        actions = getattr(view_func, 'actions', None) or {}
+        stats.action = actions.get(method, method)
+        stats.budget = getattr(view_class, 'query_budgets', {}).get(
+            stats.action, settings.QUERY_BUDGET)
+
+    def process_template_response(self, request, response):
+        stats = request.request_stats
+        started = time.perf_counter()
+
+        def finish(response):
+            stats.render_time = time.perf_counter() - started
+
+        response.add_post_render_callback(finish)
+        return response
+
+
+class ConnectionHealthMiddleware:
+    """Проверяет постоянные соединения с базой перед первым их использованием.
+
+    В Django 2.2 нет CONN_HEALTH_CHECKS, и соединение, закрытое со стороны
+    сервера (перезапуск PostgreSQL, таймаут pgbouncer), иначе обнаружилось
+    бы только ошибкой первого запроса view. Как и в Django 4.1, соединение
+    проверяется не больше одного раза за запрос и только если запрос
+    к нему обращается: запросы без SQL обходятся без лишнего SELECT 1.
+    """
+
+    def __init__(self, get_response):
+        if not (settings.DB_CONN_HEALTH_CHECKS and any(
+                database.get('CONN_MAX_AGE')
+                for database in settings.DATABASES.values())):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        checked = []
+        for alias in connections:
+            database = connections[alias]
+            if database.connection is not None:
+                # Все обращения к базе проходят через ensure_connection,
+                # поэтому проверка подменяет его до первого вызова.
+                database.ensure_connection = partial(
+                    self.check_connection, database)
+                checked.append(database)
+        try:
+            return self.get_response(request)
+        finally:
+            for database in checked:
+                database.__dict__.pop('ensure_connection', None)
+
+    @staticmethod
+    def check_connection(database):
+        del database.ensure_connection
+        if (database.connection is not None
+                and not database.in_atomic_block
+                and not database.is_usable()):
+            database.close()
+        database.ensure_connection()
@@ -3,12 +3,17 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('users.urls')),
     path('api/', include('recipes.urls')),
 ]
 
+if settings.REQUEST_METRICS:
+    urlpatterns.append(path('metrics/', metrics_view, name='metrics'))
+
 if settings.DEBUG:
     urlpatterns = (
         urlpatterns
@@ -0,0 +1,17 @@
+import os
+
+# SERVER_MODE=asgi запускает проект через uvicorn-воркеры: в каждом
+# процессе цикл событий обслуживает соединения, а Django работает
+# в пуле из ASGI_THREADS потоков.
+SERVER_MODE = os.getenv('SERVER_MODE', default='wsgi')
+
+bind = os.getenv('GUNICORN_BIND', default='0:8000')
+# Как и у gunicorn по умолчанию, один процесс: каждый процесс держит
+# свои соединения с базой и свой пул обработки картинок.
+workers = int(os.getenv('GUNICORN_WORKERS', default=1))
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'foodgram_project.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram_project.wsgi:application'
@@ -2,6 +2,7 @@ from django.contrib import admin
 
 from .models import (Tag, Ingredient, Recipe, IngredientForRecipe,
                      Favorite, ShoppingCart)
+from .search import update_search_vectors
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -25,6 +26,13 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'author', 'get_ingredients')
     list_filter = ('name', 'author', 'tags')
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        ingredients = IngredientForRecipe.objects.filter(
+            recipe=form.instance)
+        ingredients.update(recipe_ingredients_count=ingredients.count())
+        update_search_vectors(Recipe.objects.filter(pk=form.instance.pk))
+
     def get_ingredients(self, obj):
         return '\n'.join(
             [str(ingredients) for ingredients in obj.ingredients.all()])
@@ -34,6 +42,10 @@ class IngredientForRecipeAdmin(admin.ModelAdmin):
     list_display = ('ingredient', 'recipe', 'amount')
     fields = ['ingredient', 'recipe', 'amount']
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        update_search_vectors(Recipe.objects.filter(pk=obj.recipe_id))
+
 
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
@@ -0,0 +1,79 @@
+import asyncio
+
+from django.db import close_old_connections
+from django.utils.http import http_date
+
+from .cache import (get_reference_etag, get_reference_version,
+                    peek_reference_payload)
+
+JSON_MEDIA_TYPES = (b'', b'*/*', b'application/*', b'application/json')
+
+
+def accepts_json(accept):
+    media_types = {item.split(b';')[0].strip() for item in accept.split(b',')}
+    return b'text/html' not in media_types and bool(
+        media_types & set(JSON_MEDIA_TYPES))
+
+
+def load_reference_version(name):
+    """Читает версию справочника в потоке пула вне запроса Django.
+
+    Соединение этого потока закрывается по тем же правилам, что и после
+    обычного запроса: при ошибке или по истечении CONN_MAX_AGE.
+    """
+    try:
+        return get_reference_version(name)
+    finally:
+        close_old_connections()
+
+
+def etag_matches(etag, if_none_match):
+    values = {value.strip().replace('W/', '', 1)
+              for value in if_none_match.split(',')}
+    return '*' in values or etag in values
+
+
+class ReferenceListApplication:
+    """Отдаёт закэшированные списки тегов и ингредиентов без потока Django.
+
+    Обрабатываются только GET без параметров с ответом в JSON, и только
+    если JSON уже лежит в памяти процесса. Всё остальное передаётся
+    дальше. Справочники публичны, поэтому токен здесь не проверяется.
+    """
+    paths = {'/api/tags/': 'tags', '/api/ingredients/': 'ingredients'}
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        name = self.paths.get(scope.get('path'))
+        headers = dict(scope.get('headers', ()))
+        if (name is None or scope['method'] != 'GET'
+                or scope['query_string']
+                or not accepts_json(headers.get(b'accept', b''))):
+            await self.application(scope, receive, send)
+            return
+        version = await asyncio.get_running_loop().run_in_executor(
+            None, load_reference_version, name)
+        payload = peek_reference_payload(name, version)
+        if payload is None:
+            await self.application(scope, receive, send)
+            return
+        etag = get_reference_etag(name, version)
+        response_headers = [
+            (b'etag', etag.encode()),
+            (b'last-modified', http_date(version[1]).encode()),
+        ]
+        if_none_match = headers.get(b'if-none-match', b'').decode('latin1')
+        if if_none_match and etag_matches(etag, if_none_match):
+            await send({'type': 'http.response.start', 'status': 304,
+                        'headers': response_headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        response_headers += [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode()),
+        ]
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': payload})
@@ -0,0 +1,123 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ReferenceVersion, ShoppingCart, Tag
+
+SHOPPING_LIST_KEY = 'shopping_list_pdf:{}'
+SHOPPING_LIST_TIMEOUT = 60 * 60 * 24
+RECIPE_KEY = 'recipe:{}:{}'
+RECIPE_TIMEOUT = 60 * 60 * 24
+
+_reference_versions = {}
+_reference_payloads = {}
+
+
+def get_shopping_list_digest(ingredients):
+    digest = hashlib.sha256()
+    for item in ingredients:
+        digest.update((f'{item["ingredient__name"]}\t'
+                       f'{item["ingredient__measurement_unit"]}\t'
+                       f'{item["total_amount"]}\n').encode())
+    return digest.hexdigest()
+
+
+def get_cached_shopping_list(user_id, ingredients, render):
+    key = SHOPPING_LIST_KEY.format(user_id)
+    digest = get_shopping_list_digest(ingredients)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == digest:
+        return cached[1]
+    content = render(ingredients)
+    cache.set(key, (digest, content), SHOPPING_LIST_TIMEOUT)
+    return content
+
+
+def invalidate_shopping_lists(user_ids):
+    cache.delete_many([SHOPPING_LIST_KEY.format(user_id)
+                       for user_id in user_ids])
+
+
+def invalidate_recipe_shopping_lists(recipe_id):
+    invalidate_shopping_lists(ShoppingCart.objects.filter(
+        recipe_id=recipe_id).values_list('user_id', flat=True))
+
+
+def get_reference_version(name):
+    """Возвращает пару (счётчик версии, время изменения) справочника.
+
+    Версия хранится в базе и видна всем процессам. Процесс перечитывает
+    её не чаще раза в REFERENCE_VERSION_TTL секунд, поэтому другие
+    процессы узнают об изменении справочника не позже чем через TTL.
+    """
+    now = time.monotonic()
+    cached = _reference_versions.get(name)
+    if cached is not None and now - cached[0] < settings.REFERENCE_VERSION_TTL:
+        return cached[1]
+    row, _ = ReferenceVersion.objects.get_or_create(name=name)
+    version = (row.counter, int(row.updated_at.timestamp()))
+    _reference_versions[name] = (now, version)
+    return version
+
+
+def bump_reference_version(name):
+    ReferenceVersion.objects.get_or_create(name=name)
+    ReferenceVersion.objects.filter(name=name).update(
+        counter=F('counter') + 1, updated_at=timezone.now())
+    _reference_versions.pop(name, None)
+    transaction.on_commit(lambda: _reference_versions.pop(name, None))
+
+
+def get_reference_etag(name, version):
+    return '"{}-{}-{}"'.format(name, *version)
+
+
+def peek_reference_payload(name, version):
+    cached = _reference_payloads.get(name)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    return None
+
+
+def get_reference_payload(name, version, render):
+    """Отдаёт JSON справочника из памяти процесса, пока версия не сменилась."""
+    content = peek_reference_payload(name, version)
+    if content is not None:
+        return content
+    content = render()
+    _reference_payloads[name] = (version, content)
+    return content
+
+
+def get_recipe_version(recipe, base_url):
+    """Версия общей для всех пользователей части представления рецепта.
+
+    Учитывает изменение самого рецепта, справочников тегов и ингредиентов
+    и адрес сайта, от которого зависят абсолютные ссылки на картинки.
+    """
+    return hashlib.sha1(':'.join(map(str, (
+        recipe.updated_at.timestamp(),
+        get_reference_version('tags')[0],
+        get_reference_version('ingredients')[0],
+        base_url,
+    ))).encode()).hexdigest()
+
+
+def get_cached_recipe(recipe, version, render):
+    key = RECIPE_KEY.format(recipe.id, version)
+    data = cache.get(key)
+    if data is None:
+        data = render()
+        cache.set(key, data, RECIPE_TIMEOUT)
+    return data
+
+
+def get_tag_ids_by_slug():
+    return get_reference_payload(
+        'tag_slugs', get_reference_version('tags'),
+        lambda: dict(Tag.objects.values_list('slug', 'id')))
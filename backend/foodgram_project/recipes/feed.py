@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from users.models import Follow
+
+from .models import FeedEntry, Recipe
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def fan_out_recipe(recipe):
+    """Записывает новый рецепт в ленты подписчиков автора.
+
+    Если подписчиков больше FEED_FANOUT_LIMIT, автор помечается
+    has_many_followers и его рецепты читаются в get_feed напрямую.
+    Пометка не снимается, иначе из лент пропали бы рецепты,
+    опубликованные без рассылки.
+    """
+    author = recipe.author
+    if not author.has_many_followers:
+        limit = settings.FEED_FANOUT_LIMIT
+        followers = list(Follow.objects.filter(author=author).values_list(
+            'user_id', flat=True)[:limit + 1])
+        if len(followers) <= limit:
+            FeedEntry.objects.bulk_create(
+                (FeedEntry(user_id=user_id, recipe=recipe,
+                           pub_date=recipe.pub_date)
+                 for user_id in followers),
+                batch_size=BATCH_SIZE)
+            return
+        User.objects.filter(pk=author.pk).update(has_many_followers=True)
+        author.has_many_followers = True
+
+
+def backfill_feed(user, author):
+    """Добавляет в ленту рецепты автора, на которого подписался user."""
+    if author.has_many_followers:
+        return
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user=user, recipe_id=recipe_id, pub_date=pub_date)
+         for recipe_id, pub_date in Recipe.objects.filter(
+            author=author).values_list('id', 'pub_date').iterator()),
+        batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def remove_from_feed(user, author_id):
+    FeedEntry.objects.filter(
+        user=user, recipe__author_id=author_id).delete()
+
+
+def get_feed(user):
+    """Пары (recipe_id, pub_date) ленты, новые первыми.
+
+    Обычно это один диапазон индекса feed_user_pub_date_idx.
+    Рецепты авторов с has_many_followers добавляются через UNION,
+    который заодно убирает дубли записей, сделанных до пометки.
+    """
+    entries = FeedEntry.objects.filter(user=user).values_list(
+        'recipe_id', 'pub_date')
+    pulled_authors = list(Follow.objects.filter(
+        user=user, author__has_many_followers=True).values_list(
+        'author_id', flat=True))
+    if pulled_authors:
+        entries = entries.union(Recipe.objects.filter(
+            author_id__in=pulled_authors).order_by().values_list(
+            'id', 'pub_date'))
+    return entries.order_by('-pub_date', '-recipe_id')
@@ -1,19 +1,53 @@
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
 from django_filters import rest_framework as filters
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend
 
-from .models import Recipe
+from .cache import get_tag_ids_by_slug
+from .models import Recipe, Tag
+from .search import search_recipes
 
 
 class RecipeFilterSet(filters.FilterSet):
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = filters.CharFilter(method='filter_tags')
+    search = filters.CharFilter(method='filter_search')
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'По популярности'),),
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'search', 'author', 'is_favorited',
+                  'is_in_shopping_cart', 'ordering')
+
+    def filter_tags(self, queryset, name, value):
+        tag_ids_by_slug = get_tag_ids_by_slug()
+        slugs = self.request.query_params.getlist(name)
+        tag_ids = [tag_ids_by_slug[slug] for slug in slugs
+                   if slug in tag_ids_by_slug]
+        missing = [slug for slug in slugs if slug not in tag_ids_by_slug]
+        if missing:
+            # Словарь мог устареть: тег создан в другом процессе.
+            tag_ids.extend(Tag.objects.filter(
+                slug__in=missing).values_list('id', flat=True))
+        if not tag_ids:
+            return queryset.none()
+        return queryset.filter(id__in=Recipe.tags.through.objects.filter(
+            tag_id__in=tag_ids).values('recipe_id'))
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        if value == 'popular':
+            return queryset.order_by('-favorites_count', '-pub_date')
+        return queryset
 
     def filter_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value is True:
@@ -26,5 +60,42 @@ class RecipeFilterSet(filters.FilterSet):
         return queryset
 
 
-class CustomSearchFilter(SearchFilter):
+class IngredientSearchFilter(BaseFilterBackend):
+    """Поиск ингредиентов для автодополнения.
+
+    Сначала идут совпадения по началу названия, затем по подстроке,
+    затем (только в PostgreSQL) нечёткие совпадения pg_trgm.
+    """
     search_param = 'name'
+    limit_param = 'limit'
+    default_limit = 20
+    max_limit = 100
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        return min(max(limit, 1), self.max_limit)
+
+    def filter_queryset(self, request, queryset, view):
+        search = request.query_params.get(self.search_param, '').strip()
+        if not search:
+            return queryset
+        condition = Q(name__istartswith=search) | Q(name__icontains=search)
+        ordering = ['rank', 'name']
+        if connections[queryset.db].vendor == 'postgresql':
+            condition |= Q(name__trigram_similar=search)
+            queryset = queryset.annotate(
+                similarity=TrigramSimilarity('name', search))
+            ordering = ['rank', '-similarity', 'name']
+        queryset = queryset.filter(condition).annotate(
+            rank=Case(
+                When(name__istartswith=search, then=Value(0)),
+                When(name__icontains=search, then=Value(1)),
+                default=Value(2),
+                output_field=IntegerField(),
+            )).order_by(*ordering)
+        if getattr(view, 'action', None) != 'list':
+            return queryset
+        return queryset[:self.get_limit(request)]
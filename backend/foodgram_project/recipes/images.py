@@ -0,0 +1,179 @@
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+RENDITIONS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'detail': (1200, 1200),
+}
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+logger = logging.getLogger(__name__)
+
+_slots = threading.BoundedSemaphore(max(settings.IMAGE_QUEUE_SIZE, 1))
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def render_renditions(content, image_format, quality):
+    """Строит уменьшенные копии картинки без метаданных.
+
+    Принимает байты исходного файла, возвращает словарь
+    {имя размера: байты}. Исходник декодируется один раз.
+    Функция не обращается к Django и может выполняться в другом процессе.
+    """
+    with Image.open(BytesIO(content)) as source:
+        image = ImageOps.exif_transpose(source)
+        mode = 'RGB' if image_format == 'JPEG' else 'RGBA'
+        if image.mode not in ('RGB', mode):
+            image = image.convert(mode)
+        renditions = {}
+        for name, size in RENDITIONS.items():
+            rendition = image.copy()
+            rendition.thumbnail(size, Image.LANCZOS)
+            buffer = BytesIO()
+            rendition.save(buffer, image_format, quality=quality)
+            renditions[name] = buffer.getvalue()
+    return renditions
+
+
+def read_image(recipe):
+    recipe.image.open('rb')
+    try:
+        return recipe.image.read()
+    finally:
+        recipe.image.close()
+
+
+def save_renditions(recipe, renditions):
+    stem = os.path.splitext(os.path.basename(recipe.image.name))[0]
+    extension = EXTENSIONS[settings.RECIPE_IMAGE_FORMAT]
+    update_fields = ['image_status', 'updated_at']
+    for name, content in renditions.items():
+        field = getattr(recipe, f'image_{name}')
+        if field:
+            field.delete(save=False)
+        field.save(f'{stem}_{name}.{extension}', ContentFile(content),
+                   save=False)
+        update_fields.append(f'image_{name}')
+    recipe.image_status = recipe.IMAGE_READY
+    recipe.save(update_fields=update_fields)
+
+
+def build_recipe_renditions(recipe):
+    """Синхронно строит копии картинки рецепта в текущем процессе."""
+    try:
+        renditions = render_renditions(
+            read_image(recipe), settings.RECIPE_IMAGE_FORMAT,
+            settings.RECIPE_IMAGE_QUALITY)
+    except (OSError, ValueError):
+        recipe.image_status = recipe.IMAGE_FAILED
+        recipe.save(update_fields=['image_status', 'updated_at'])
+        raise
+    save_renditions(recipe, renditions)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS)
+        return _executor  # noqa: R504
+
+
+def discard_executor(executor):
+    """Забывает сломанный пул, следующая задача создаст новый."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def schedule_recipe_renditions(recipe):
+    """Ставит обработку картинки в очередь после фиксации транзакции.
+
+    Рецепт остаётся в состоянии «pending», пока копии не готовы. Если
+    пул занят или сломан, рецепт так и остаётся в очереди в базе и будет
+    обработан командой build_image_renditions, запускаемой по cron.
+    """
+    recipe.image_status = recipe.IMAGE_PENDING
+    recipe.save(update_fields=['image_status', 'updated_at'])
+    if settings.IMAGE_WORKERS:
+        transaction.on_commit(lambda: submit_renditions(recipe))
+    else:
+        transaction.on_commit(lambda: build_quietly(recipe))
+
+
+def build_quietly(recipe):
+    try:
+        build_recipe_renditions(recipe)
+    except (OSError, ValueError):
+        logger.exception('Не удалось обработать картинку рецепта %s.',
+                         recipe.pk)
+
+
+def submit_renditions(recipe):
+    if not _slots.acquire(blocking=False):
+        logger.warning('Очередь обработки картинок заполнена, рецепт %s '
+                       'ждёт build_image_renditions.', recipe.pk)
+        return
+    executor = get_executor()
+    try:
+        future = executor.submit(
+            render_renditions, read_image(recipe),
+            settings.RECIPE_IMAGE_FORMAT, settings.RECIPE_IMAGE_QUALITY)
+    except Exception as error:
+        # Вызывается из on_commit: транзакция уже зафиксирована, и
+        # исключение превратило бы успешный запрос в ошибку 500.
+        _slots.release()
+        if isinstance(error, BrokenProcessPool):
+            discard_executor(executor)
+        logger.exception('Не удалось поставить картинку рецепта %s в '
+                         'очередь, она ждёт build_image_renditions.',
+                         recipe.pk)
+        return
+    image_name = recipe.image.name
+    future.add_done_callback(
+        lambda done: finish_renditions(recipe.pk, image_name, done, executor))
+
+
+def finish_renditions(recipe_id, image_name, future, executor):
+    """Сохраняет результат из пула; выполняется в служебном потоке."""
+    from .models import Recipe
+
+    _slots.release()
+    close_old_connections()
+    try:
+        recipe = Recipe.objects.filter(pk=recipe_id).first()
+        if recipe is None or recipe.image.name != image_name:
+            return
+        try:
+            renditions = future.result()
+        except BrokenProcessPool:
+            # Процесс пула умер; картинка не виновата, рецепт остаётся
+            # в очереди до build_image_renditions.
+            logger.exception('Пул обработки картинок сломан, рецепт %s '
+                             'ждёт build_image_renditions.', recipe_id)
+            discard_executor(executor)
+            return
+        except Exception:
+            logger.exception('Не удалось обработать картинку рецепта %s.',
+                             recipe_id)
+            Recipe.objects.filter(pk=recipe_id).update(
+                image_status=Recipe.IMAGE_FAILED, updated_at=timezone.now())
+            return
+        save_renditions(recipe, renditions)
+    finally:
+        connection.close()
@@ -0,0 +1,240 @@
+import base64
+import json
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from PIL import Image
+from recipes.models import (Favorite, FeedEntry, Ingredient,
+                            IngredientForRecipe, Recipe, ShoppingCart, Tag)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Follow
+
+User = get_user_model()
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = max(0, int(round(percent / 100 * len(values))) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+def png_image(size=(600, 400)):
+    buffer = BytesIO()
+    Image.new('RGB', size, '#E26C2D').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = ('Заполняет временную базу данными по образцу datadump.json '
+            'и измеряет задержку и число SQL-запросов основных API.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--max-queries', type=int,
+            help='Завершиться с ошибкой, если запрос превысил это число '
+                 'SQL-запросов.')
+        parser.add_argument(
+            '--datadump',
+            default=os.path.join(settings.BASE_DIR, 'datadump.json'))
+
+    def handle(self, *args, **options):
+        with self.seeded_database(options):
+            results = self.run_benchmarks(options['iterations'])
+        self.report(results)
+        budget = options['max_queries']
+        over_budget = [name for name, (_, queries) in results.items()
+                       if budget is not None and max(queries) > budget]
+        if over_budget:
+            raise CommandError(
+                f'Превышен бюджет {budget} SQL-запросов: '
+                f'{", ".join(over_budget)}')
+
+    @contextmanager
+    def seeded_database(self, options):
+        self.random = random.Random(options['seed'])
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                # Картинки обрабатываются синхронно, чтобы фоновые потоки
+                # не обращались к тестовой базе после её удаления.
+                with override_settings(MEDIA_ROOT=media_root,
+                                       IMAGE_WORKERS=0):
+                    started = time.monotonic()
+                    self.seed(options)
+                    self.stdout.write(f'Данные созданы за '
+                                      f'{time.monotonic() - started:.1f} с')
+                    yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def load_datadump(self, path):
+        with open(path, encoding='utf-8') as file:
+            records = json.load(file)
+        dump = {}
+        for record in records:
+            dump.setdefault(record['model'], []).append(record['fields'])
+        return dump
+
+    def seed(self, options):
+        dump = self.load_datadump(options['datadump'])
+        Tag.objects.bulk_create(
+            [Tag(**fields) for fields in dump['recipes.tag']])
+        Ingredient.objects.bulk_create(
+            [Ingredient(**fields) for fields in dump['recipes.ingredient']],
+            ignore_conflicts=True)
+        tags = list(Tag.objects.all())
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        templates = dump['recipes.recipe']
+
+        User.objects.bulk_create(
+            User(username=f'user{i}', email=f'user{i}@example.org',
+                 first_name='Имя', last_name='Фамилия', password='!')
+            for i in range(options['users']))
+        users = list(User.objects.order_by('id'))
+        self.viewer = users[0]
+
+        with open(os.path.join(settings.MEDIA_ROOT, 'benchmark.png'),
+                  'wb') as file:
+            file.write(png_image())
+        Recipe.objects.bulk_create(
+            Recipe(name=f'{template["name"]} #{i}', text=template['text'],
+                   cooking_time=template['cooking_time'],
+                   image='benchmark.png', author=self.random.choice(users))
+            for i, template in (
+                (i, templates[i % len(templates)])
+                for i in range(options['recipes'])))
+        recipes = list(Recipe.objects.all())
+
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes
+            for tag in self.random.sample(
+                tags, self.random.randint(1, len(tags))))
+        IngredientForRecipe.objects.bulk_create(
+            IngredientForRecipe(recipe=recipe, ingredient_id=ingredient_id,
+                                amount=self.random.randint(1, 500),
+                                recipe_ingredients_count=len(sample))
+            for recipe, sample in (
+                (recipe, self.random.sample(
+                    ingredient_ids, self.random.randint(3, 15)))
+                for recipe in recipes)
+            for ingredient_id in sample)
+        for model, count in ((Favorite, 20), (ShoppingCart, 10)):
+            model.objects.bulk_create(
+                model(user=user, recipe=recipe)
+                for user in users
+                for recipe in self.random.sample(
+                    recipes, min(count, len(recipes))))
+        Follow.objects.bulk_create(
+            Follow(user=user, author=author)
+            for user in users
+            for author in self.random.sample(users, min(10, len(users)))
+            if author != user)
+        recipes_by_author = {}
+        for recipe in recipes:
+            recipes_by_author.setdefault(recipe.author_id, []).append(recipe)
+        FeedEntry.objects.bulk_create(
+            FeedEntry(user_id=user_id, recipe=recipe,
+                      pub_date=recipe.pub_date)
+            for user_id, author_id in Follow.objects.values_list(
+                'user_id', 'author_id')
+            for recipe in recipes_by_author.get(author_id, ()))
+        self.recipes = recipes
+        self.ingredient_ids = ingredient_ids
+        self.tags = tags
+
+    def get_client(self):
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=self.viewer)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def get_paths(self):
+        client = self.get_client()
+        image = ('data:image/png;base64,'
+                 + base64.b64encode(png_image((1200, 800))).decode())
+        tag_slugs = '&'.join(f'tags={tag.slug}' for tag in self.tags[:2])
+        detail = f'/api/recipes/{self.recipes[0].id}/'
+        own_recipe = Recipe.objects.filter(author=self.viewer).first()
+
+        def recipe_data():
+            return {
+                'name': 'Бенчмарк', 'text': 'Описание', 'cooking_time': 10,
+                'image': image, 'tags': [tag.id for tag in self.tags],
+                'ingredients': [
+                    {'id': ingredient_id, 'amount': 10}
+                    for ingredient_id in self.random.sample(
+                        self.ingredient_ids, 30)],
+            }
+
+        def download():
+            response = client.get('/api/recipes/download_shopping_cart/')
+            b''.join(response.streaming_content)
+            return response
+
+        paths = {
+            'recipe list': lambda: client.get('/api/recipes/'),
+            'recipe list (filters)': lambda: client.get(
+                f'/api/recipes/?{tag_slugs}&is_favorited=1'),
+            'recipe list (cursor)': lambda: client.get(
+                '/api/recipes/?cursor='),
+            'recipe detail': lambda: client.get(detail),
+            'recipe create': lambda: client.post(
+                '/api/recipes/', recipe_data(), format='json'),
+            'ingredient search': lambda: client.get(
+                '/api/ingredients/?name=мо'),
+            'feed': lambda: client.get('/api/recipes/feed/'),
+            'subscriptions': lambda: client.get(
+                '/api/users/subscriptions/?recipes_limit=3'),
+            'shopping list download': download,
+        }
+        if own_recipe is not None:
+            paths['recipe patch'] = lambda: client.patch(
+                f'/api/recipes/{own_recipe.id}/', recipe_data(),
+                format='json')
+        return paths
+
+    def run_benchmarks(self, iterations):
+        results = {}
+        for name, request in self.get_paths().items():
+            durations, queries = [], []
+            for _ in range(iterations):
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    response = request()
+                    durations.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    raise CommandError(
+                        f'{name}: статус {response.status_code}')
+                queries.append(len(context.captured_queries))
+            results[name] = (durations, queries)
+        return results
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"Запрос":<25}{"p50, мс":>10}{"p99, мс":>10}{"SQL":>10}')
+        for name, (durations, queries) in results.items():
+            low, high = min(queries), max(queries)
+            sql = str(low) if low == high else f'{low}-{high}'
+            self.stdout.write(
+                f'{name:<25}{percentile(durations, 50) * 1000:>10.1f}'
+                f'{percentile(durations, 99) * 1000:>10.1f}{sql:>10}')
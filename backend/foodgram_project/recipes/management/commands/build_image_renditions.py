@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from recipes.images import build_recipe_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Строит уменьшенные копии картинок рецептов, которые давно '
+            'ждут обработки. Картинки с ошибкой обработки пропускаются, '
+            'их пересобирает --all.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересобрать копии у всех рецептов.')
+        parser.add_argument(
+            '--pending-for', type=int, default=5,
+            help='Сколько минут рецепт должен ждать обработки, чтобы '
+                 'не забрать картинку, которая ещё в пуле воркера.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(
+                image_status=Recipe.IMAGE_PENDING,
+                updated_at__lt=timezone.now() - timedelta(
+                    minutes=options['pending_for']))
+        built = failed = 0
+        for recipe in recipes.iterator():
+            try:
+                build_recipe_renditions(recipe)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe.id}: {error}')
+                continue
+            built += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {built}, с ошибками: {failed}'))
@@ -0,0 +1,102 @@
+import json
+
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .benchmark import Command as BenchmarkCommand
+
+INDEX_SCANS = ('Index Scan', 'Index Only Scan')
+
+
+def iter_full_scans(plan):
+    """Находит узлы плана, которые отбирают строки фильтром мимо индекса.
+
+    Это Seq Scan с фильтром и обход индекса с фильтром, но без условия
+    по самому индексу. Полное чтение без фильтра (COUNT(*) по всей
+    таблице, соединение со всей таблицей) индекс не ускорит.
+    """
+    if 'Filter' in plan and (
+            plan['Node Type'] == 'Seq Scan'
+            or plan['Node Type'] in INDEX_SCANS
+            and 'Index Cond' not in plan):
+        yield plan['Relation Name']
+    for child in plan.get('Plans', ()):
+        yield from iter_full_scans(child)
+
+
+class Command(BenchmarkCommand):
+    help = ('Заполняет временную базу PostgreSQL, выполняет основные '
+            'запросы API и проверяет через EXPLAIN, что ни один SELECT '
+            'не читает большую таблицу мимо индекса. Для реалистичных '
+            'планов задайте объём данных, например --recipes 20000.')
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--min-rows', type=int, default=5000,
+            help='Не проверять таблицы меньше этого числа строк, например '
+                 'справочник ингредиентов: их планировщик законно читает '
+                 'целиком.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Проверка планов требует PostgreSQL.')
+        with self.seeded_database(options):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            problems = self.check_paths(options['min_rows'])
+        for name, table, sql in problems:
+            self.stderr.write(f'{name}: чтение {table} мимо индекса\n  {sql}')
+        if problems:
+            raise CommandError(
+                f'Запросов, читающих таблицу мимо индекса: {len(problems)}')
+        self.stdout.write(self.style.SUCCESS(
+            'Все запросы используют индексы.'))
+
+    def get_paths(self):
+        paths = super().get_paths()
+        client = self.get_client()
+        author = self.recipes[0].author_id
+        paths.update({
+            'recipe list (author)': lambda: client.get(
+                f'/api/recipes/?author={author}'),
+            'recipe list (cart)': lambda: client.get(
+                '/api/recipes/?is_in_shopping_cart=1'),
+            'recipe list (popular)': lambda: client.get(
+                '/api/recipes/?ordering=popular'),
+        })
+        return paths
+
+    def check_paths(self, min_rows):
+        large_tables = self.get_large_tables(min_rows)
+        problems = []
+        for name, request in self.get_paths().items():
+            with CaptureQueriesContext(connection) as context:
+                request()
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                problems.extend(
+                    (name, table, sql)
+                    for table in sorted(self.get_full_scans(sql))
+                    if table in large_tables)
+        return problems
+
+    @staticmethod
+    def get_large_tables(min_rows):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relname FROM pg_class WHERE relkind = 'r' "
+                "AND reltuples >= %s", [min_rows])
+            return {row[0] for row in cursor.fetchall()}
+
+    @staticmethod
+    def get_full_scans(sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return set(iter_full_scans(plan[0]['Plan']))
@@ -1,16 +1,148 @@
+import csv
 import json
+import os
+import time
+from io import StringIO
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipes.cache import bump_reference_version
 from recipes.models import Ingredient
 
+READ_SIZE = 64 * 1024
+
+
+def iter_json_array(file):
+    """Читает JSON-массив объектов по одному, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    for chunk in iter(lambda: file.read(READ_SIZE), ''):
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    break
+                if buffer[0] != '[':
+                    raise CommandError('Ожидается JSON-массив.')
+                buffer = buffer[1:]
+                started = True
+                continue
+            if buffer[:1] in (',', ']'):
+                buffer = buffer[1:]
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except ValueError:
+                break
+            yield item
+            buffer = buffer[end:]
+    if buffer.strip():
+        raise CommandError('Некорректный JSON в конце файла.')
+
+
+def iter_csv_rows(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield {'name': row[0], 'measurement_unit': row[1]}
+
+
+def iter_batches(items, size):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
 
 class Command(BaseCommand):
+    help = ('Загружает ингредиенты из JSON или CSV. Повторная загрузка '
+            'не создаёт дубликатов.')
+    readers = {'json': iter_json_array, 'csv': iter_csv_rows}
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'ingredients.json'))
+        parser.add_argument('--format', choices=sorted(self.readers))
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY даже в PostgreSQL.')
+
     def handle(self, *args, **options):
-        with open('ingredients.json', 'rb') as f:
-            data = json.load(f)
-            for i in data:
-                ingredient = Ingredient()
-                ingredient.name = i['name']
-                ingredient.measurement_unit = i['measurement_unit']
-                ingredient.save()
-                print(i['name'], i['measurement_unit'])
+        path = options['path']
+        file_format = (options['format']
+                       or os.path.splitext(path)[1].lstrip('.').lower())
+        if file_format not in self.readers:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        use_copy = (connection.vendor == 'postgresql'
+                    and not options['no_copy'])
+        started = time.monotonic()
+        with open(path, encoding='utf-8') as file, transaction.atomic():
+            count_before = Ingredient.objects.count()
+            rows = self.iter_unique(self.readers[file_format](file))
+            write = self.write_copy if use_copy else self.write_bulk
+            read = 0
+            if use_copy:
+                self.create_copy_table()
+            for batch in iter_batches(rows, options['batch_size']):
+                write(batch)
+                read += len(batch)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'Обработано строк: {read}')
+            if use_copy:
+                self.merge_copy_table()
+            created = Ingredient.objects.count() - count_before
+        bump_reference_version('ingredients')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Уникальных строк: {read}, добавлено: {created}, '
+            f'время: {elapsed:.2f} с, '
+            f'скорость: {read / max(elapsed, 1e-6):.0f} строк/с'))
+
+    @staticmethod
+    def iter_unique(items):
+        seen = set()
+        for item in items:
+            key = (item['name'].strip(), item['measurement_unit'].strip())
+            if all(key) and key not in seen:
+                seen.add(key)
+                yield key
+
+    @staticmethod
+    def write_bulk(batch):
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=measurement_unit)
+             for name, measurement_unit in batch],
+            ignore_conflicts=True)
+
+    @staticmethod
+    def create_copy_table():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_import '
+                '(name text, measurement_unit text) ON COMMIT DROP')
+
+    @staticmethod
+    def write_copy(batch):
+        buffer = StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                'COPY ingredient_import (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)', buffer)
+
+    @staticmethod
+    def merge_copy_table():
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT name, measurement_unit FROM ingredient_import '
+                f'ON CONFLICT (name, measurement_unit) DO NOTHING')
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import (Favorite, IngredientForRecipe, Recipe,
+                            ShoppingCart)
+
+COUNTERS = (
+    ('favorites_count', Favorite),
+    ('shopping_cart_count', ShoppingCart),
+)
+
+
+def actual_count(model):
+    return Coalesce(Subquery(
+        model.objects.filter(recipe=OuterRef('pk')).order_by().values(
+            'recipe').annotate(total=Count('id')).values('total'),
+        output_field=IntegerField()), 0)
+
+
+def actual_recipe_size():
+    return Subquery(
+        IngredientForRecipe.objects.filter(
+            recipe=OuterRef('recipe')).order_by().values('recipe').annotate(
+            total=Count('id')).values('total'),
+        output_field=IntegerField())
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики избранного и списка покупок '
+            'у рецептов и число ингредиентов в строках рецептов, '
+            'исправляя расхождения одним UPDATE на счётчик.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        for counter, model in COUNTERS:
+            drifted = Recipe.objects.annotate(
+                actual=actual_count(model)).exclude(**{counter: F('actual')})
+            if options['dry_run']:
+                self.stdout.write(f'{counter}: расхождений {drifted.count()}')
+                continue
+            updated = Recipe.objects.filter(
+                pk__in=drifted.values('pk')).update(
+                **{counter: actual_count(model)})
+            self.stdout.write(self.style.SUCCESS(
+                f'{counter}: исправлено {updated}'))
+        self.reconcile_recipe_sizes(options['dry_run'])
+
+    def reconcile_recipe_sizes(self, dry_run):
+        counter = 'recipe_ingredients_count'
+        drifted = IngredientForRecipe.objects.annotate(
+            actual=actual_recipe_size()).exclude(**{counter: F('actual')})
+        if dry_run:
+            self.stdout.write(f'{counter}: расхождений {drifted.count()}')
+            return
+        updated = IngredientForRecipe.objects.filter(
+            pk__in=drifted.values('pk')).update(
+            **{counter: actual_recipe_size()})
+        self.stdout.write(self.style.SUCCESS(
+            f'{counter}: исправлено {updated}'))
@@ -0,0 +1,38 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+INDEXES = {
+    'recipes_ingredient_name_upper_like': (
+        'ON recipes_ingredient (UPPER(name::text) text_pattern_ops)'),
+    'recipes_ingredient_name_upper_trgm': (
+        'ON recipes_ingredient USING gin (UPPER(name::text) gin_trgm_ops)'),
+    'recipes_ingredient_name_trgm': (
+        'ON recipes_ingredient USING gin (name gin_trgm_ops)'),
+}
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, definition in INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} {definition}')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_auto_20220419_1453'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
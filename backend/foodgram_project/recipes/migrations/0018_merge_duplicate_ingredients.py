@@ -0,0 +1,39 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientForRecipe = apps.get_model('recipes', 'IngredientForRecipe')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit').annotate(
+        keep_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates:
+        keep_id = duplicate['keep_id']
+        others = Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        ).exclude(id=keep_id)
+        for item in IngredientForRecipe.objects.filter(ingredient__in=others):
+            kept = IngredientForRecipe.objects.filter(
+                recipe_id=item.recipe_id, ingredient_id=keep_id).first()
+            if kept is None:
+                item.ingredient_id = keep_id
+                item.save()
+            else:
+                kept.amount += item.amount
+                kept.save()
+                item.delete()
+        others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_recipe_tags_tag_recipe_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:18
+
+from django.db import migrations, models
+
+
+def mark_ready(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.exclude(image_thumbnail='').update(image_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0021_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(choices=[('pending', 'Обрабатывается'), ('ready', 'Готова'), ('failed', 'Ошибка обработки')], default='pending', editable=False, max_length=10, verbose_name='Состояние картинки'),
+        ),
+        migrations.RunPython(mark_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:05
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+INDEX_NAME = 'recipe_search_vector_idx'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "UPDATE recipes_recipe AS recipe SET search_vector = "
+        "setweight(to_tsvector(%s, recipe.name), 'A') || "
+        "setweight(to_tsvector(%s, recipe.text), 'B') || "
+        "setweight(to_tsvector(%s, COALESCE(("
+        "SELECT string_agg(ingredient.name, ' ') "
+        "FROM recipes_ingredientforrecipe AS amount "
+        "JOIN recipes_ingredient AS ingredient "
+        "ON ingredient.id = amount.ingredient_id "
+        "WHERE amount.recipe_id = recipe.id), '')), 'C')",
+        [settings.SEARCH_CONFIG] * 3)
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} '
+        f'ON recipes_recipe USING gin (search_vector)')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0024_recipe_author_pub_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:31
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+
+
+def fill_recipe_ingredients_count(apps, schema_editor):
+    IngredientForRecipe = apps.get_model('recipes', 'IngredientForRecipe')
+    IngredientForRecipe.objects.update(recipe_ingredients_count=Subquery(
+        IngredientForRecipe.objects.filter(
+            recipe=OuterRef('recipe')).order_by().values('recipe').annotate(
+            total=Count('id')).values('total'),
+        output_field=IntegerField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0025_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredientforrecipe',
+            name='recipe_ingredients_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Всего ингредиентов в рецепте'),
+        ),
+        migrations.RunPython(fill_recipe_ingredients_count,
+                             migrations.RunPython.noop),
+    ]
@@ -1,6 +1,12 @@
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework.mixins import ListModelMixin, RetrieveModelMixin
 from rest_framework.viewsets import GenericViewSet
 
+from .cache import (get_reference_etag, get_reference_payload,
+                    get_reference_version)
+
 
 class ListRetriveViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
     pass
@@ -8,3 +14,31 @@ class ListRetriveViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
 
 class ListViewSet(ListModelMixin, GenericViewSet):
     pass
+
+
+class ReferenceListMixin:
+    """Отдаёт полный список справочника из кэша с ETag и Last-Modified.
+
+    Запросы с параметрами (например, поиск) обрабатываются как обычно.
+    """
+    reference_name = None
+
+    def list(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if request.query_params or renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        version = get_reference_version(self.reference_name)
+        etag = get_reference_etag(self.reference_name, version)
+        last_modified = version[1]
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(
+                get_reference_payload(
+                    self.reference_name, version,
+                    lambda: renderer.render(self.get_serializer(
+                        self.get_queryset(), many=True).data)),
+                content_type=renderer.media_type)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
@@ -30,12 +31,25 @@ class Ingredient(models.Model):
         ordering = ['name']
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'], name='unique_ingredient')
+        ]
 
     def __str__(self):
         return f'{self.name}, {self.measurement_unit}'
 
 
 class Recipe(models.Model):
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUSES = (
+        (IMAGE_PENDING, 'Обрабатывается'),
+        (IMAGE_READY, 'Готова'),
+        (IMAGE_FAILED, 'Ошибка обработки'),
+    )
+
     name = models.CharField(verbose_name='Название рецепта', max_length=100)
     text = models.TextField(
         verbose_name='Описание рецепта', help_text='Введите описание рецепта')
@@ -47,14 +61,39 @@ class Recipe(models.Model):
         validators=[MinValueValidator
                     (1, 'Время приготовления не может быть меньше минуты.')])
     image = models.ImageField(verbose_name='Картинка')
+    image_thumbnail = models.ImageField(
+        verbose_name='Миниатюра', blank=True, editable=False)
+    image_card = models.ImageField(
+        verbose_name='Картинка для карточки', blank=True, editable=False)
+    image_detail = models.ImageField(
+        verbose_name='Картинка для страницы рецепта', blank=True,
+        editable=False)
+    image_status = models.CharField(
+        verbose_name='Состояние картинки', max_length=10,
+        choices=IMAGE_STATUSES, default=IMAGE_PENDING, editable=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                verbose_name='Автор')
     pub_date = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное', default=0, editable=False)
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в список покупок', default=0,
+        editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=['-favorites_count', '-pub_date'],
+                         name='recipe_popular_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='recipe_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -70,6 +109,9 @@ class IngredientForRecipe(models.Model):
         verbose_name='Количество',
         validators=[MinValueValidator
                     (1, 'Количество не может быть меньше 1.')])
+    recipe_ingredients_count = models.PositiveIntegerField(
+        verbose_name='Всего ингредиентов в рецепте', default=0,
+        editable=False)
 
     class Meta:
         verbose_name = 'Количество ингредиентов в рецепте'
@@ -117,3 +159,50 @@ class ShoppingCart(models.Model):
             models.UniqueConstraint(
                 fields=['user', 'recipe'], name='unique_shoppin_cart')
         ]
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписчика, записанный при публикации.
+
+    pub_date копируется из рецепта, чтобы лента читалась одним
+    диапазоном индекса feed_user_pub_date_idx.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             verbose_name='Подписчик',
+                             related_name='feed')
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE,
+                               verbose_name='Рецепт',
+                               related_name='feed_entries')
+    pub_date = models.DateTimeField('Дата создания рецепта')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_feed_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-recipe'],
+                         name='feed_user_pub_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}.'
+
+
+class ReferenceVersion(models.Model):
+    """Версия справочника, общая для всех процессов.
+
+    По ней процессы узнают, что закэшированный у них справочник устарел.
+    """
+    name = models.CharField(primary_key=True, max_length=20)
+    counter = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочников'
+
+    def __str__(self):
+        return f'{self.name}: {self.counter}'
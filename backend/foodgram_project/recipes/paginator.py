@@ -0,0 +1,44 @@
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class RecipePaginator(Paginator):
+    @cached_property
+    def count(self):
+        """Считает рецепты без аннотаций is_favorited и is_in_shopping_cart.
+
+        Они не меняют число строк, но иначе Django 2.2 вычисляет оба
+        EXISTS и GROUP BY для каждого рецепта в COUNT.
+        """
+        return self.object_list.values('pk').count()
+
+
+class RecipeRanking:
+    """Сгруппированный рейтинг рецептов для Paginator.
+
+    COUNT по такому queryset оборачивает в подзапрос весь GROUP BY
+    вместе с JOIN рецептов, поэтому считаются только различные
+    recipe_id среди исходных строк.
+    """
+    ordered = True
+
+    def __init__(self, ranking, rows):
+        self.ranking = ranking
+        self.rows = rows
+
+    def count(self):
+        return self.rows.values('recipe_id').distinct().count()
+
+    def __getitem__(self, key):
+        return self.ranking[key]
+
+
+class RecipePageNumberPagination(PageNumberPagination):
+    django_paginator_class = RecipePaginator
+
+
+class RecipeCursorPagination(CursorPagination):
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = 100
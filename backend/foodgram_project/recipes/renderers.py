@@ -0,0 +1,100 @@
+import csv
+from io import BytesIO
+
+from reportlab.pdfgen.canvas import Canvas
+from rest_framework.renderers import BaseRenderer
+
+CHUNK_SIZE = 64 * 1024
+PDF_FONT_NAME = 'FreeSans'
+
+
+def iter_chunks(content, chunk_size=CHUNK_SIZE):
+    for start in range(0, len(content), chunk_size):
+        yield content[start:start + chunk_size]
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Отдаёт список покупок по частям для StreamingHttpResponse."""
+    charset = None
+
+    @property
+    def filename(self):
+        return f'shopping_list.{self.format}'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''.join(self.stream(data or []))
+
+    def stream(self, ingredients):
+        raise NotImplementedError
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    title_height = 800
+    top = 750
+    bottom = 50
+    line_height = 25
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        buffer = BytesIO()
+        page = Canvas(buffer)
+        page.setFont(PDF_FONT_NAME, size=24)
+        page.drawString(200, self.title_height, 'Список ингредиентов')
+        page.setFont(PDF_FONT_NAME, size=16)
+        height = self.top
+        for i, item in enumerate(data or [], start=1):
+            if height < self.bottom:
+                page.showPage()
+                page.setFont(PDF_FONT_NAME, size=16)
+                height = self.title_height
+            page.drawString(75, height, (
+                f'{i}) {item["ingredient__name"]} - '
+                f'{item["total_amount"]} '
+                f'{item["ingredient__measurement_unit"]}'))
+            height -= self.line_height
+        page.showPage()
+        page.save()
+        return buffer.getvalue()
+
+    def stream(self, ingredients):
+        return iter_chunks(self.render(ingredients))
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ['Ингредиент', 'Количество', 'Единица измерения']
+        ).encode(self.charset)
+        for item in ingredients:
+            yield writer.writerow([
+                item['ingredient__name'],
+                item['total_amount'],
+                item['ingredient__measurement_unit'],
+            ]).encode(self.charset)
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def stream(self, ingredients):
+        yield 'Список ингредиентов\n\n'.encode(self.charset)
+        for i, item in enumerate(ingredients, start=1):
+            yield (f'{i}) {item["ingredient__name"]} - '
+                   f'{item["total_amount"]} '
+                   f'{item["ingredient__measurement_unit"]}\n'
+                   ).encode(self.charset)
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import (Case, F, IntegerField, OuterRef, Q, Subquery,
+                              TextField, Value, When)
+
+from .models import IngredientForRecipe
+
+
+def get_search_vector():
+    """Название важнее описания, описание важнее ингредиентов."""
+    ingredient_names = Subquery(
+        IngredientForRecipe.objects.filter(recipe=OuterRef('pk')).order_by(
+        ).values('recipe').annotate(names=StringAgg(
+            'ingredient__name', delimiter=' ')).values('names'),
+        output_field=TextField())
+    return (
+        SearchVector('name', weight='A', config=settings.SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=settings.SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight='C',
+                       config=settings.SEARCH_CONFIG))
+
+
+def update_search_vectors(queryset):
+    if connections[queryset.db].vendor == 'postgresql':
+        queryset.update(search_vector=get_search_vector())
+
+
+def search_recipes(queryset, value):
+    """Ищет рецепты и сортирует их по релевантности.
+
+    В PostgreSQL используется сохранённый search_vector с GIN-индексом.
+    В остальных базах (SQLite в тестах) — поиск подстроки в названии,
+    описании и ингредиентах: совпадения в названии идут первыми.
+    SQLite не учитывает регистр только для латиницы.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        query = SearchQuery(value, config=settings.SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)).order_by(
+            '-search_rank', '-pub_date', '-id')
+    return queryset.filter(
+        Q(name__icontains=value) | Q(text__icontains=value)
+        | Q(id__in=IngredientForRecipe.objects.filter(
+            ingredient__name__icontains=value).values('recipe_id'))
+    ).annotate(search_rank=Case(
+        When(name__icontains=value, then=Value(1)),
+        default=Value(0), output_field=IntegerField(),
+    )).order_by('-search_rank', '-pub_date', '-id')
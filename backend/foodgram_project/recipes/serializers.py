@@ -1,9 +1,13 @@
-from django.db.models import F
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from users.serializers import CustomUserSerializer
 
+from .cache import invalidate_recipe_shopping_lists
+from .images import schedule_recipe_renditions
+from .search import update_search_vectors
 from .models import (Tag, Ingredient, Recipe, IngredientForRecipe,
                      Favorite, ShoppingCart)
 
@@ -41,8 +45,21 @@ class RecipeSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    # Поля, которые зависят от пользователя или меняются без обновления
+    # updated_at, поэтому не кэшируются вместе с остальным рецептом.
+    personal_fields = ('author', 'is_favorited', 'is_in_shopping_cart',
+                       'favorites_count', 'shopping_cart_count')
+
+    def to_personal_representation(self, instance):
+        return {
+            name: self.fields[name].to_representation(
+                self.fields[name].get_attribute(instance))
+            for name in self.personal_fields
+        }
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
@@ -50,6 +67,8 @@ class RecipeSerializer(serializers.ModelSerializer):
             recipe_id=obj, user_id=request.user).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
@@ -58,7 +77,7 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = '__all__'
+        exclude = ('search_vector',)
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
@@ -70,14 +89,22 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
 
     def validate_ingredients(self, data):
-        ingredients = self.initial_data.get('ingredients')
-        if ingredients == []:
+        if not data:
             raise serializers.ValidationError('Выберите хотя бы 1 ингредиент.')
-        for ingredient in ingredients:
-            if int(ingredient['amount']) <= 0:
+        amounts = {}
+        for ingredient in data:
+            if ingredient['amount'] <= 0:
                 raise serializers.ValidationError('Количество не может быть'
                                                   'меньше 1.')
-        return data
+            ingredient_id = ingredient['ingredient']['id']
+            amounts[ingredient_id] = (amounts.get(ingredient_id, 0)
+                                      + ingredient['amount'])
+        missing = amounts.keys() - Ingredient.objects.in_bulk(
+            list(amounts)).keys()
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {sorted(missing)}.')
+        return amounts
 
     def validate_cooking_time(self, data):
         if data <= 0:
@@ -85,17 +112,18 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                                               ' быть меньше минуты.')
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
-        validated_data.pop('ingredients_amount')
+        ingredients = validated_data.pop('ingredients_amount')
         tags = validated_data.pop('tags')
         recipe = super().create(validated_data)
-        ingredients_amount = self.get_ingredients_list(
-            self.initial_data['ingredients'], recipe)
         recipe.tags.set(tags)
-        recipe.ingredients_amount.set(ingredients_amount)
-        recipe.save()
+        self.get_ingredients_list(ingredients, recipe)
+        update_search_vectors(Recipe.objects.filter(pk=recipe.pk))
+        schedule_recipe_renditions(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
@@ -107,44 +135,45 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         if tags_data:
             instance.tags.set(tags_data)
         if ingredients_data:
-            ingred = self.initial_data['ingredients']
-            ingredients = self.get_ingredients_list(
-                ingred,
-                instance)
-            instance.ingredients_amount.set(ingredients)
+            self.get_ingredients_list(ingredients_data, instance)
         instance.save()
+        if 'image' in validated_data:
+            schedule_recipe_renditions(instance)
         return instance
 
-    def get_ingredients_list(self, ingredients, recipe_id):
-        ingredients_list = []
-        ingredients_to_delete = IngredientForRecipe.objects.filter(
-            recipe=recipe_id)
-        if ingredients_to_delete:
-            for ingredient in ingredients_to_delete:
-                ingredient.delete()
-        for ingredient in ingredients:
-            ingredient_id = ingredient['id']
-            amount = ingredient['amount']
-            ingredient_instance = Ingredient.objects.get(id=ingredient_id)
-            if (IngredientForRecipe.objects.
-               filter(recipe=recipe_id, ingredient_id=ingredient_id).exists()):
-                amount += F('amount')
-            ingredient, updated = IngredientForRecipe.objects.update_or_create(
-                recipe=recipe_id, ingredient=ingredient_instance,
-                defaults={'amount': amount})
-            ingredients_list.append(ingredient)
-        return ingredients_list
+    def get_ingredients_list(self, ingredients, recipe):
+        IngredientForRecipe.objects.filter(recipe=recipe).delete()
+        IngredientForRecipe.objects.bulk_create(
+            IngredientForRecipe(recipe=recipe, ingredient_id=ingredient_id,
+                                amount=amount,
+                                recipe_ingredients_count=len(ingredients))
+            for ingredient_id, amount in ingredients.items())
+        invalidate_recipe_shopping_lists(recipe.id)
+
+    def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance], 'tags', Prefetch(
+                'ingredients_amount',
+                queryset=IngredientForRecipe.objects.select_related(
+                    'ingredient')))
+        return super().to_representation(instance)
 
     class Meta:
         model = Recipe
-        fields = '__all__'
+        exclude = ('search_vector',)
+
+
+class CookableRecipeSerializer(RecipeSerializer):
+    matched_ingredients = serializers.IntegerField(read_only=True)
+    coverage = serializers.FloatField(read_only=True)
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumbnail', 'image_card',
+                  'cooking_time')
 
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
@@ -160,6 +189,12 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
             instance.recipe, context=context).data
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False, max_length=100)
+
+
 class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -0,0 +1,49 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import (bump_reference_version, invalidate_recipe_shopping_lists,
+                    invalidate_shopping_lists)
+from .models import (Ingredient, IngredientForRecipe, Recipe, ShoppingCart,
+                     Tag)
+from .search import update_search_vectors
+
+
+# Удаление из корзины кэш не сбрасывает: get_cached_shopping_list
+# сверяет дайджест текущей корзины при каждом скачивании, а receiver
+# post_delete заставил бы QuerySet.delete() выбирать строки перед DELETE.
+@receiver(post_save, sender=ShoppingCart)
+def invalidate_user_shopping_list(sender, instance, **kwargs):
+    invalidate_shopping_lists([instance.user_id])
+
+
+@receiver(post_save, sender=IngredientForRecipe)
+def invalidate_ingredient_shopping_lists(sender, instance, **kwargs):
+    # search_vector обновляется один раз на запись рецепта: в
+    # RecipeCreateSerializer и в админке после сохранения всех строк.
+    invalidate_recipe_shopping_lists(instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, created, update_fields,
+                                **kwargs):
+    # Новый рецепт ещё без ингредиентов: вектор строит тот, кто их
+    # сохраняет (RecipeCreateSerializer.create, RecipeAdmin.save_related).
+    if created:
+        return
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        update_search_vectors(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    bump_reference_version('tags')
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    bump_reference_version('ingredients')
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_search_vectors(sender, instance, **kwargs):
+    update_search_vectors(Recipe.objects.filter(ingredients=instance))
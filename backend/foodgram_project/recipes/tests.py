@@ -0,0 +1,208 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from users.models import Follow
+
+from .models import (Favorite, Ingredient, IngredientForRecipe, Recipe,
+                     ShoppingCart, Tag)
+from .paginator import RecipePageNumberPagination
+
+User = get_user_model()
+
+
+class RecipeTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.org', password='password',
+            first_name='Имя', last_name='Фамилия')
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.org',
+            password='password', first_name='Имя', last_name='Фамилия')
+        cls.tags = [
+            Tag.objects.create(name='Завтрак', color='#E26C2D',
+                               slug='breakfast'),
+            Tag.objects.create(name='Обед', color='#49B64E', slug='lunch'),
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name='Мука', measurement_unit='г'),
+            Ingredient.objects.create(name='Молоко', measurement_unit='мл'),
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipes(self, count):
+        recipes = []
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {i}', text='Описание', cooking_time=10,
+                image='recipe.png', author=self.author)
+            recipe.tags.set(self.tags)
+            IngredientForRecipe.objects.bulk_create(
+                IngredientForRecipe(recipe=recipe, ingredient=ingredient,
+                                    amount=100,
+                                    recipe_ingredients_count=len(
+                                        self.ingredients))
+                for ingredient in self.ingredients)
+            recipes.append(recipe)
+        return recipes
+
+    def count_queries(self, method, path, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(path, **kwargs)
+        return response, len(context.captured_queries)
+
+
+class RecipeListQueriesTest(RecipeTestCase):
+    # COUNT, страница рецептов, теги, ингредиенты, подписки на авторов.
+    list_queries = 5
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        recipes = self.create_recipes(RecipePageNumberPagination.page_size)
+        Favorite.objects.create(user=self.user, recipe=recipes[0])
+        ShoppingCart.objects.create(user=self.user, recipe=recipes[1])
+        response, full_page = self.count_queries('get', '/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), len(recipes))
+        self.assertEqual(full_page, self.list_queries)
+
+        Recipe.objects.exclude(pk=recipes[0].pk).delete()
+        response, single = self.count_queries('get', '/api/recipes/')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(single, full_page)
+
+    def test_flags_come_from_annotations(self):
+        recipes = self.create_recipes(2)
+        Favorite.objects.create(user=self.user, recipe=recipes[0])
+        ShoppingCart.objects.create(user=self.user, recipe=recipes[1])
+        response = self.client.get('/api/recipes/')
+        flags = {item['id']: (item['is_favorited'],
+                              item['is_in_shopping_cart'])
+                 for item in response.data['results']}
+        self.assertEqual(flags, {recipes[0].id: (True, False),
+                                 recipes[1].id: (False, True)})
+
+
+class RecipeTagFilterTest(RecipeTestCase):
+
+    def test_unknown_slug_is_looked_up_in_database(self):
+        recipe = self.create_recipes(1)[0]
+        self.client.get('/api/recipes/?tags=breakfast')
+        # bulk_create не шлёт сигналов: словарь слагов в памяти
+        # процесса остаётся прежним, как при создании тега в другом.
+        Tag.objects.bulk_create([
+            Tag(name='Ужин', color='#8775D2', slug='dinner')])
+        recipe.tags.add(Tag.objects.get(slug='dinner'))
+        response = self.client.get('/api/recipes/?tags=dinner')
+        self.assertEqual([item['id'] for item in response.data['results']],
+                         [recipe.id])
+
+    def test_nonexistent_slug_returns_nothing(self):
+        self.create_recipes(1)
+        response = self.client.get('/api/recipes/?tags=missing')
+        self.assertEqual(response.data['results'], [])
+
+
+class RecipePaginationTest(RecipeTestCase):
+
+    def test_cookable_ignores_cursor_param(self):
+        recipe = self.create_recipes(1)[0]
+        response = self.client.get(
+            '/api/recipes/cookable/',
+            {'ingredients': self.ingredients[0].id, 'cursor': 'abc'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['results']],
+                         [recipe.id])
+
+    def test_list_switches_to_cursor_pagination(self):
+        self.create_recipes(1)
+        response = self.client.get('/api/recipes/', {'cursor': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('count', response.data)
+
+    def test_feed_ignores_cursor_param(self):
+        # Рецепты авторов с has_many_followers читаются через UNION.
+        User.objects.filter(pk=self.author.pk).update(
+            has_many_followers=True)
+        Follow.objects.create(user=self.user, author=self.author)
+        recipes = self.create_recipes(2)
+        response = self.client.get('/api/recipes/feed/', {'cursor': 'abc'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['results']],
+                         [recipes[1].id, recipes[0].id])
+
+
+class RecipeLinkDeleteTest(RecipeTestCase):
+
+    def test_delete_is_single_statement(self):
+        recipe = self.create_recipes(1)[0]
+        for path, model in (('favorite', Favorite),
+                            ('shopping_cart', ShoppingCart)):
+            with self.subTest(path=path):
+                model.objects.create(user=self.user, recipe=recipe)
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.delete(
+                        f'/api/recipes/{recipe.id}/{path}/')
+                self.assertEqual(response.status_code, 204)
+                # Один DELETE связи и UPDATE счётчика, без SELECT.
+                self.assertEqual(
+                    [query['sql'].split()[0]
+                     for query in context.captured_queries
+                     if not query['sql'].startswith(
+                         ('SAVEPOINT', 'RELEASE'))],
+                    ['DELETE', 'UPDATE'])
+
+    def test_delete_missing_link_returns_400(self):
+        recipe = self.create_recipes(1)[0]
+        for path in ('favorite', 'shopping_cart'):
+            with self.subTest(path=path):
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.delete(
+                        f'/api/recipes/{recipe.id}/{path}/')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(
+                    [query['sql'].split()[0]
+                     for query in context.captured_queries
+                     if not query['sql'].startswith(
+                         ('SAVEPOINT', 'RELEASE'))],
+                    ['DELETE'])
+
+    def test_shopping_cart_delete_resets_shopping_list(self):
+        recipe = self.create_recipes(1)[0]
+        ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        path = '/api/recipes/download_shopping_cart/?format=txt'
+        self.assertIn('Мука', self.get_content(path))
+        self.client.delete(f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.assertNotIn('Мука', self.get_content(path))
+
+    def get_content(self, path):
+        response = self.client.get(path)
+        return b''.join(response.streaming_content).decode()
+
+    def test_anonymous_delete_is_rejected(self):
+        recipe = self.create_recipes(1)[0]
+        self.client.force_authenticate(None)
+        for path in ('favorite', 'shopping_cart'):
+            with self.subTest(path=path):
+                response = self.client.delete(
+                    f'/api/recipes/{recipe.id}/{path}/')
+                self.assertEqual(response.status_code, 401)
+
+
+class RecipeDetailCacheTest(RecipeTestCase):
+
+    def test_detail_is_private_per_user(self):
+        recipe = self.create_recipes(1)[0]
+        path = f'/api/recipes/{recipe.id}/'
+        response = self.client.get(path)
+        self.assertIn('Authorization', response['Vary'])
+        self.assertIn('private', response['Cache-Control'])
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Authorization', response['Vary'])
+        self.assertIn('private', response['Cache-Control'])
@@ -1,135 +1,382 @@
-from django.http.response import HttpResponse
+import hashlib
+import json
+
+from django.db import transaction
+from django.db.models import (Count, Exists, ExpressionWrapper, F,
+                              FloatField, Max, OuterRef, Prefetch, Sum,
+                              prefetch_related_objects)
+from django.db.models.functions import Greatest
+from django.http.response import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from django.shortcuts import get_object_or_404
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen.canvas import Canvas
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from foodgram_project.middleware import SerializationTimingMixin
+from users.mixins import SubscriptionResolverMixin
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status, viewsets, generics
 
-from .filters import RecipeFilterSet, CustomSearchFilter
+from .cache import (get_cached_recipe, get_cached_shopping_list,
+                    get_recipe_version, invalidate_shopping_lists)
+from .feed import fan_out_recipe, get_feed
+from .filters import IngredientSearchFilter, RecipeFilterSet
 from .models import (Tag, Ingredient, Recipe, IngredientForRecipe,
                      Favorite, ShoppingCart)
+from .paginator import (RecipeCursorPagination, RecipePageNumberPagination,
+                        RecipeRanking)
 from .permissions import Author, ReadOnly
+from .renderers import (ShoppingListPDFRenderer, ShoppingListCSVRenderer,
+                        ShoppingListTextRenderer, iter_chunks)
 from .serializers import (TagSerializer, IngredientSerializer,
-                          RecipeSerializer,
+                          RecipeSerializer, CookableRecipeSerializer,
                           ShoppingCartSerializer,
-                          RecipeCreateSerializer,
+                          RecipeCreateSerializer, RecipeIdsSerializer,
                           IngredientListSerializer,
                           FavoriteSerializer)
-from .mixins import ListRetriveViewSet
+from .mixins import ListRetriveViewSet, ReferenceListMixin
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(SerializationTimingMixin, SubscriptionResolverMixin,
+                    viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
+    subscription_author_field = 'author_id'
+    pagination_class = RecipePageNumberPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilterSet
+    # Запись рецепта с картинкой, тегами и ингредиентами — около 21
+    # запроса по manage.py benchmark, больше QUERY_BUDGET для чтения.
+    query_budgets = {'create': 30, 'partial_update': 30, 'update': 30}
+
+    @property
+    def paginator(self):
+        """Курсорная пагинация по ?cursor= только для списка рецептов.
+
+        Остальные действия (cookable, feed) пагинируют свои выборки
+        через pagination_class, переданный в @action.
+        """
+        if not hasattr(self, '_paginator'):
+            cursor_param = RecipeCursorPagination.cursor_query_param
+            if (self.action == 'list'
+                    and cursor_param in self.request.query_params):
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    related = (
+        'tags',
+        Prefetch('ingredients_amount',
+                 queryset=IngredientForRecipe.objects.select_related(
+                     'ingredient')),
+    )
+
+    def get_queryset(self):
+        queryset = Recipe.objects.select_related('author')
+        if self.action != 'retrieve':
+            queryset = queryset.prefetch_related(*self.related)
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Отдаёт рецепт из кэша и отвечает 304 по совпавшему ETag.
+
+        Общая часть представления кэшируется по версии рецепта, а поля
+        из personal_fields вычисляются для каждого запроса.
+        """
+        recipe = self.get_object()
+        serializer = self.get_serializer(recipe)
+        personal = serializer.to_personal_representation(recipe)
+        version = get_recipe_version(recipe, request.build_absolute_uri('/'))
+        etag = '"{}"'.format(hashlib.sha1(json.dumps(
+            [version, request.accepted_renderer.format, personal],
+            sort_keys=True).encode()).hexdigest())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response({
+                **get_cached_recipe(
+                    recipe, version,
+                    lambda: self.get_shared_representation(serializer)),
+                **personal})
+        response['ETag'] = etag
+        # Флаги и ETag свои у каждого пользователя: общий кэш не должен
+        # отдавать их другому.
+        patch_vary_headers(response, ['Authorization'])
+        patch_cache_control(response, private=True)
+        return response
+
+    def get_shared_representation(self, serializer):
+        prefetch_related_objects([serializer.instance], *self.related)
+        return {
+            name: (None if name in serializer.personal_fields else value)
+            for name, value in serializer.data.items()
+        }
 
     def get_serializer_class(self):
         if self.action in ['create', 'partial_update']:
             return RecipeCreateSerializer
+        if self.action == 'cookable':
+            return CookableRecipeSerializer
         return RecipeSerializer
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        fan_out_recipe(serializer.save(author=self.request.user))
 
     @staticmethod
-    def post_method_for_actions(request, pk, serializers):
+    @transaction.atomic
+    def post_method_for_actions(request, pk, serializers, counter):
         data = {'user': request.user.id, 'recipe': pk}
         serializer = serializers(data=data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        Recipe.objects.filter(id=pk).update(**{counter: F(counter) + 1})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @staticmethod
-    def delete_method_for_actions(request, pk, model):
-        user = request.user
-        recipe = get_object_or_404(Recipe, id=pk)
-        model_obj = get_object_or_404(model, user=user, recipe=recipe)
-        model_obj.delete()
+    @transaction.atomic
+    def delete_method_for_actions(request, pk, model, counter, error):
+        """Удаляет связь одним DELETE без предварительных SELECT.
+
+        Нет связи или самого рецепта — 400, как в docs/openapi-schema.yml.
+        """
+        deleted, _ = model.objects.filter(
+            user=request.user, recipe_id=pk).delete()
+        if not deleted:
+            return Response({'errors': error},
+                            status=status.HTTP_400_BAD_REQUEST)
+        Recipe.objects.filter(id=pk, **{f'{counter}__gt': 0}).update(
+            **{counter: F(counter) - 1})
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @staticmethod
+    def get_batch_links(request, model):
+        """Проверяет id рецептов одним запросом.
+
+        Возвращает id без повторов и словарь {id: есть ли связь
+        с пользователем} только для существующих рецептов.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['recipes']))
+        links = dict(Recipe.objects.filter(id__in=ids).order_by().annotate(
+            linked=Exists(model.objects.filter(
+                user=request.user, recipe=OuterRef('pk')))).values_list(
+            'id', 'linked'))
+        return ids, links
+
+    @staticmethod
+    def get_batch_results(ids, links, changed, statuses):
+        changed_status, unchanged_status = statuses
+        return [
+            {'id': pk,
+             'status': ('not_found' if pk not in links
+                        else changed_status if pk in changed
+                        else unchanged_status)}
+            for pk in ids]
+
+    @transaction.atomic
+    def post_batch_for_actions(self, request, model, counter):
+        """Добавляет рецепты списком; счётчики растут только у новых."""
+        ids, links = self.get_batch_links(request, model)
+        created = {pk for pk, linked in links.items() if not linked}
+        model.objects.bulk_create(
+            [model(user=request.user, recipe_id=pk) for pk in created],
+            ignore_conflicts=True)
+        Recipe.objects.filter(id__in=created).update(
+            **{counter: F(counter) + 1})
+        return self.get_batch_results(
+            ids, links, created, ('created', 'exists'))
+
+    @transaction.atomic
+    def delete_batch_for_actions(self, request, model, counter):
+        ids, links = self.get_batch_links(request, model)
+        deleted = {pk for pk, linked in links.items() if linked}
+        model.objects.filter(
+            user=request.user, recipe_id__in=deleted).delete()
+        Recipe.objects.filter(
+            id__in=deleted, **{f'{counter}__gt': 0}).update(
+            **{counter: F(counter) - 1})
+        return self.get_batch_results(
+            ids, links, deleted, ('deleted', 'absent'))
+
     @action(detail=True, methods=["POST"],
             permission_classes=[IsAuthenticated])
     def favorite(self, request, pk):
         return self.post_method_for_actions(
-            request=request, pk=pk, serializers=FavoriteSerializer)
+            request=request, pk=pk, serializers=FavoriteSerializer,
+            counter='favorites_count')
 
     @favorite.mapping.delete
     def delete_favorite(self, request, pk):
         return self.delete_method_for_actions(
-            request=request, pk=pk, model=Favorite)
+            request=request, pk=pk, model=Favorite,
+            counter='favorites_count', error='Рецепта нет в избранном.')
 
     @action(detail=True, methods=["POST"],
             permission_classes=[IsAuthenticated])
     def shopping_cart(self, request, pk):
         return self.post_method_for_actions(
-            request=request, pk=pk, serializers=ShoppingCartSerializer)
+            request=request, pk=pk, serializers=ShoppingCartSerializer,
+            counter='shopping_cart_count')
 
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk):
         return self.delete_method_for_actions(
-            request=request, pk=pk, model=ShoppingCart)
+            request=request, pk=pk, model=ShoppingCart,
+            counter='shopping_cart_count',
+            error='Рецепта нет в списке покупок.')
+
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='favorite', url_name='favorite-batch')
+    def favorite_batch(self, request):
+        if request.method == 'POST':
+            results = self.post_batch_for_actions(
+                request=request, model=Favorite, counter='favorites_count')
+        else:
+            results = self.delete_batch_for_actions(
+                request=request, model=Favorite, counter='favorites_count')
+        return Response({'results': results})
+
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='shopping_cart', url_name='shopping-cart-batch')
+    def shopping_cart_batch(self, request):
+        if request.method == 'POST':
+            results = self.post_batch_for_actions(
+                request=request, model=ShoppingCart,
+                counter='shopping_cart_count')
+            # bulk_create не отправляет post_save, по которому
+            # сбрасывается кэш списка покупок.
+            invalidate_shopping_lists([request.user.id])
+        else:
+            results = self.delete_batch_for_actions(
+                request=request, model=ShoppingCart,
+                counter='shopping_cart_count')
+        return Response({'results': results})
 
     @action(detail=False, methods=['get'],
-            permission_classes=[IsAuthenticated])
+            pagination_class=PageNumberPagination)
+    def cookable(self, request):
+        """Рецепты, которые можно приготовить из имеющихся ингредиентов.
+
+        coverage — доля ингредиентов рецепта, которые есть у пользователя.
+        Рейтинг считается одним GROUP BY по строкам IngredientForRecipe
+        с переданными ингредиентами без JOIN рецептов: общее число
+        ингредиентов хранится в каждой строке. Затем для страницы
+        выбираются сами рецепты.
+        """
+        matches = IngredientForRecipe.objects.filter(
+            ingredient_id__in=self.get_ingredient_ids(request))
+        filtered = self.filter_queryset(Recipe.objects.all())
+        if filtered.query.has_filters():
+            matches = matches.filter(recipe__in=filtered.values('pk'))
+        ranking = matches.values('recipe_id').annotate(
+            matched_ingredients=Count('id'),
+            coverage=ExpressionWrapper(
+                F('matched_ingredients') * 1.0 / Greatest(
+                    Max('recipe_ingredients_count'), 'matched_ingredients'),
+                output_field=FloatField())).order_by(
+            '-coverage', '-matched_ingredients', '-recipe_id')
+        page = self.paginate_queryset(RecipeRanking(ranking, matches))
+        rows = {row['recipe_id']: row for row in page}
+        recipes = self.get_recipes_in_order(list(rows))
+        for recipe in recipes:
+            recipe.matched_ingredients = rows[recipe.id]['matched_ingredients']
+            recipe.coverage = rows[recipe.id]['coverage']
+        serializer = self.get_serializer(recipes, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'],
+            pagination_class=PageNumberPagination)
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь."""
+        page = self.paginate_queryset(get_feed(request.user))
+        serializer = self.get_serializer(
+            self.get_recipes_in_order([recipe_id for recipe_id, _ in page]),
+            many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def get_recipes_in_order(self, ids):
+        recipes = self.get_queryset().in_bulk(ids)
+        return [recipes[pk] for pk in ids if pk in recipes]
+
+    @staticmethod
+    def get_ingredient_ids(request):
+        try:
+            ingredient_ids = {
+                int(value)
+                for value in request.query_params.getlist('ingredients')}
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': 'id ингредиентов должны быть числами.'})
+        if not ingredient_ids:
+            raise ValidationError(
+                {'ingredients': 'Укажите хотя бы один ингредиент.'})
+        return ingredient_ids
+
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated],
+            renderer_classes=[ShoppingListPDFRenderer,
+                              ShoppingListCSVRenderer,
+                              ShoppingListTextRenderer])
     def download_shopping_cart(self, request):
-        final_list = {}
-        ingredients_in_recipe = IngredientForRecipe.objects.filter(
-            recipe__purchases__user=request.user).values_list(
-            'ingredient__name', 'ingredient__measurement_unit',
-            'amount')
-        for item in ingredients_in_recipe:
-            name = item[0]
-            if name not in final_list:
-                final_list[name] = {
-                    'measurement_unit': item[1],
-                    'amount': item[2]
-                }
-            else:
-                final_list[name]['amount'] += item[2]
-        pdfmetrics.registerFont(
-            TTFont('FreeSans', 'media/fonts/FreeSans.ttf'))
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = ('attachment; '
-                                           'filename="shopping_list.pdf"')
-        page = Canvas(response)
-        page.setFont('FreeSans', size=24)
-        page.drawString(200, 800, 'Список ингредиентов')
-        page.setFont('FreeSans', size=16)
-        height = 750
-        for i, (name, data) in enumerate(final_list.items(), start=1):
-            page.drawString(75, height, (f'{i}) {name} - {data["amount"]} '
-                                         f'{data["measurement_unit"]}'))
-            height -= 25
-        page.showPage()
-        page.save()
+        ingredients = IngredientForRecipe.objects.filter(
+            recipe__purchases__user=request.user).values(
+            'ingredient__name', 'ingredient__measurement_unit').annotate(
+            total_amount=Sum('amount')).order_by('ingredient__name')
+        renderer = request.accepted_renderer
+        if renderer.format == ShoppingListPDFRenderer.format:
+            content = iter_chunks(get_cached_shopping_list(
+                request.user.id, list(ingredients), renderer.render))
+        else:
+            content = renderer.stream(ingredients.iterator())
+        response = StreamingHttpResponse(
+            content, content_type=renderer.media_type)
+        response['Content-Disposition'] = (f'attachment; '
+                                           f'filename="{renderer.filename}"')
         return response
 
+    def handle_exception(self, exc):
+        if self.action == 'download_shopping_cart':
+            self.request.accepted_renderer = JSONRenderer()
+            self.request.accepted_media_type = JSONRenderer.media_type
+        return super().handle_exception(exc)
+
     def get_permissions(self):
-        if self.action in ['shopping_cart', 'download_shopping_cart']:
+        if self.action in ['favorite', 'delete_favorite', 'shopping_cart',
+                           'delete_shopping_cart', 'download_shopping_cart',
+                           'feed', 'favorite_batch', 'shopping_cart_batch']:
             permission_classes = [IsAuthenticated]
         else:
             permission_classes = [Author | ReadOnly]
         return [permission() for permission in permission_classes]
 
 
-class IngredientsViewSet(ListRetriveViewSet):
+class IngredientsViewSet(SerializationTimingMixin, ReferenceListMixin,
+                         ListRetriveViewSet):
+    reference_name = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = [CustomSearchFilter, ]
-    search_fields = ['^name']
+    filter_backends = [IngredientSearchFilter]
     pagination_class = None
 
 
-class IngredientsAmountView(generics.ListAPIView):
+class IngredientsAmountView(SerializationTimingMixin, generics.ListAPIView):
     queryset = IngredientForRecipe.objects.all()
     serializer_class = IngredientListSerializer
 
 
-class TagViewSet(ListRetriveViewSet):
+class TagViewSet(SerializationTimingMixin, ReferenceListMixin,
+                 ListRetriveViewSet):
+    reference_name = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
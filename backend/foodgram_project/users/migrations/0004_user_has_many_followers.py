@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_auto_20220406_1022'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='has_many_followers',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Рецепты не рассылаются по лентам подписчиков'),
+        ),
+    ]
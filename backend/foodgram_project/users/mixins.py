@@ -0,0 +1,13 @@
+from .resolvers import get_subscription_resolver
+
+
+class SubscriptionResolverMixin:
+    """Передаёт авторов из списка в SubscriptionResolver до сериализации."""
+    subscription_author_field = 'id'
+
+    def get_serializer(self, *args, **kwargs):
+        if args and kwargs.get('many'):
+            get_subscription_resolver(self.request).collect(
+                getattr(obj, self.subscription_author_field)
+                for obj in args[0])
+        return super().get_serializer(*args, **kwargs)
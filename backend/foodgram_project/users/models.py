@@ -9,6 +9,9 @@ class User(AbstractUser):
         verbose_name='Email',
         unique=True
     )
+    has_many_followers = models.BooleanField(
+        verbose_name='Рецепты не рассылаются по лентам подписчиков',
+        default=False, editable=False)
 
     class Meta:
         ordering = ['date_joined']
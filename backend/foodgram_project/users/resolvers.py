@@ -0,0 +1,38 @@
+from .models import Follow
+
+
+class SubscriptionResolver:
+    """Отвечает на is_subscribed для всех пользователей одного запроса.
+
+    Идентификаторы авторов собираются до сериализации, а подписки
+    текущего пользователя на них загружаются одним запросом.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.pending = set()
+        self.loaded = set()
+        self.subscribed = set()
+
+    def collect(self, author_ids):
+        self.pending.update(author_ids)
+        self.pending -= self.loaded
+
+    def is_subscribed(self, author_id):
+        if self.user.is_anonymous:
+            return False
+        if author_id not in self.loaded:
+            self.collect([author_id])
+            self.subscribed.update(Follow.objects.filter(
+                user=self.user, author_id__in=self.pending
+            ).values_list('author_id', flat=True))
+            self.loaded |= self.pending
+            self.pending = set()
+        return author_id in self.subscribed
+
+
+def get_subscription_resolver(request):
+    request = getattr(request, '_request', request)
+    if not hasattr(request, 'subscription_resolver'):
+        request.subscription_resolver = SubscriptionResolver(request.user)
+    return request.subscription_resolver
@@ -4,7 +4,8 @@ from djoser.serializers import (
 from rest_framework import serializers
 
 from recipes.models import Recipe
-from .models import User, Follow
+from .models import User
+from .resolvers import get_subscription_resolver
 
 
 class UserRegistrationSerializer(BaseUserRegistrationSerializer):
@@ -29,42 +30,46 @@ class CustomUserSerializer(serializers.ModelSerializer):
             'is_subscribed')
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return Follow.objects.filter(user=user, author=obj).exists()
+        return get_subscription_resolver(
+            self.context.get('request')).is_subscribed(obj.id)
 
 
 class RecipeSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField()
     name = serializers.CharField()
     image = Base64ImageField()
+    image_thumbnail = serializers.ImageField(read_only=True)
+    image_card = serializers.ImageField(read_only=True)
     cooking_time = serializers.IntegerField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_thumbnail', 'image_card',
+                  'cooking_time')
 
 
 class FollowSerializer(serializers.ModelSerializer):
     recipes = serializers.SerializerMethodField(read_only=True)
     recipes_count = serializers.SerializerMethodField(read_only=True)
+    is_subscribed = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
-                  'recipes', 'recipes_count')
+                  'is_subscribed', 'recipes', 'recipes_count')
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return Follow.objects.filter(user=user, author=obj).exists()
+        return get_subscription_resolver(
+            self.context.get('request')).is_subscribed(obj.id)
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return Recipe.objects.filter(author=obj).count()
 
     def get_recipes(self, obj):
+        if hasattr(obj, 'limited_recipes'):
+            return RecipeSerializer(obj.limited_recipes, many=True).data
         request = self.context.get('request')
         limit = request.GET.get('recipes_limit')
         queryset = Recipe.objects.filter(author=obj)
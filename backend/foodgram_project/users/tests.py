@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import FeedEntry, Recipe
+from rest_framework.test import APIClient
+
+from .models import Follow
+
+User = get_user_model()
+
+
+class FollowDeleteTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.org', password='password',
+            first_name='Имя', last_name='Фамилия')
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.org',
+            password='password', first_name='Имя', last_name='Фамилия')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def delete(self, user_id):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.delete(f'/api/users/{user_id}/subscribe/')
+        statements = [query['sql'].split()[0]
+                      for query in context.captured_queries
+                      if not query['sql'].startswith(
+                          ('SAVEPOINT', 'RELEASE', 'ROLLBACK'))]
+        return response, statements
+
+    def test_unsubscribe_deletes_follow_and_feed(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        recipe = Recipe.objects.create(
+            name='Рецепт', text='Описание', cooking_time=10,
+            image='recipe.png', author=self.author)
+        FeedEntry.objects.create(user=self.user, recipe=recipe,
+                                 pub_date=recipe.pub_date)
+        response, statements = self.delete(self.author.id)
+        self.assertEqual(response.status_code, 204)
+        # DELETE подписки и DELETE записей ленты, без SELECT.
+        self.assertEqual(statements, ['DELETE', 'DELETE'])
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(FeedEntry.objects.exists())
+
+    def test_not_subscribed_returns_400(self):
+        response, statements = self.delete(self.author.id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(statements, ['DELETE', 'SELECT'])
+
+    def test_unknown_user_returns_404(self):
+        response, statements = self.delete(self.author.id + 100)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(statements, ['DELETE', 'SELECT'])
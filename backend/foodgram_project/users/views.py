@@ -1,18 +1,27 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Prefetch, Window
+from django.db.models.functions import RowNumber
 from djoser.views import UserViewSet
+from foodgram_project.middleware import SerializationTimingMixin
+from recipes.feed import backfill_feed, remove_from_feed
+from recipes.models import Recipe
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404, ListAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .mixins import SubscriptionResolverMixin
 from .models import Follow
 from .serializers import FollowSerializer, CustomUserSerializer
 
 User = get_user_model()
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(SerializationTimingMixin, SubscriptionResolverMixin,
+                        UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = [IsAuthenticated]
@@ -38,34 +47,76 @@ class FollowViewSet(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         author = get_object_or_404(User, id=user_id)
-        Follow.objects.create(
-            user=request.user,
-            author_id=user_id
-        )
+        with transaction.atomic():
+            Follow.objects.create(
+                user=request.user,
+                author_id=user_id
+            )
+            backfill_feed(request.user, author)
         return Response(
             self.serializer_class(author, context={'request': request}).data,
             status=status.HTTP_201_CREATED
         )
 
+    @transaction.atomic
     def delete(self, request, *args, **kwargs):
+        """Отписывает одним DELETE; автор ищется только при ошибке."""
         user_id = self.kwargs.get('user_id')
-        get_object_or_404(User, id=user_id)
-        subscription = Follow.objects.filter(
+        deleted, _ = Follow.objects.filter(
             user=request.user,
             author_id=user_id
-        )
-        if subscription:
-            subscription.delete()
+        ).delete()
+        if deleted:
+            remove_from_feed(request.user, user_id)
             return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(User, id=user_id)
         return Response(
-            {'error': 'Вы не подписаны на пользователя'},
+            {'errors': 'Вы не подписаны на пользователя'},
             status=status.HTTP_400_BAD_REQUEST
         )
 
 
-class FollowListView(ListAPIView):
+class FollowListView(SerializationTimingMixin, SubscriptionResolverMixin,
+                     ListAPIView):
     serializer_class = FollowSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_recipes_limit(self):
+        limit = self.request.query_params.get('recipes_limit')
+        if limit is None:
+            return None
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValidationError(
+                {'recipes_limit': 'Введите целое число.'})
+        return max(limit, 0)
+
+    def get_recipes_queryset(self):
+        limit = self.get_recipes_limit()
+        queryset = Recipe.objects.all()
+        if limit is None:
+            return queryset
+        ranked = Recipe.objects.filter(
+            author__following__user=self.request.user).annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=[F('pub_date').desc(), F('id').desc()],
+            )).values('id', 'row_number')
+        sql, params = ranked.query.sql_with_params()
+        return queryset.extra(
+            where=[f'{Recipe._meta.db_table}.id IN ('
+                   f'SELECT ranked.id FROM ({sql}) ranked '
+                   f'WHERE ranked.row_number <= %s)'],
+            params=[*params, limit])
+
     def get_queryset(self):
-        return User.objects.filter(following__user=self.request.user)
+        return User.objects.filter(
+            following__user=self.request.user
+        ).annotate(
+            recipes_count=Count('recipe')
+        ).prefetch_related(
+            Prefetch('recipe_set', queryset=self.get_recipes_queryset(),
+                     to_attr='limited_recipes')
+        )